@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Time the AlertEngine with a large number of rules against checking
+    every rule on every reading.
+
+    python benchmarks/alert_bench.py [rules]
+'''
+
+import os
+import random
+import sys
+import time
+
+from wxconnector.alert import AlertEngine, ThresholdRule, RateRule, \
+                                                   RISING, FALLING, BOTH
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from delta_bench import vantage_series
+
+# measurement, units, lowest and highest threshold
+RANGES = [
+    ('temperature', 'C', -20, 40),
+    ('wind_speed', 'kph', 0, 120),
+    ('humidity', '%', 0, 100),
+    ('barometer', 'hPa', 960, 1050),
+]
+
+def make_rules(n, seed = 1):
+    rnd = random.Random(seed)
+    rules = []
+    for i in range(n):
+        what, units, lo, hi = RANGES[i % len(RANGES)]
+        if i % 50 == 0:
+            rules.append(RateRule('rate%d' % i, what,
+                                  rnd.choice((-1, 1)) * rnd.uniform(1, 5),
+                                  rnd.choice((3600, 3 * 3600)), units))
+        else:
+            rules.append(ThresholdRule('rule%d' % i, what,
+                                       rnd.uniform(lo, hi), units,
+                                       rnd.choice((RISING, FALLING, BOTH))))
+    return rules
+
+def naive(rules, series):
+    ''' Convert and test every threshold rule against every reading. '''
+    last = {}
+    fired = 0
+    for obs in series:
+        for rule in rules:
+            if not isinstance(rule, ThresholdRule):
+                continue
+            m = obs[rule.what]
+            if m is None:
+                continue
+            value = m.units.convert(m.value, rule.units)
+            prev = last.get(rule)
+            last[rule] = value
+            if prev is not None and (prev <= rule.threshold < value or
+                                     value <= rule.threshold < prev):
+                fired += 1
+    return fired
+
+def main(nrules = 10000, hours = 1):
+    series = list(vantage_series(hours))
+    rules = make_rules(nrules)
+
+    eng = AlertEngine()
+    for rule in rules:
+        eng.add_rule(rule)
+    start = time.time()
+    fired = 0
+    for obs in series:
+        fired += len(eng.add_observation(obs))
+    indexed = time.time() - start
+
+    start = time.time()
+    naive(rules, series)
+    scan = time.time() - start
+
+    print "%d observations, %d rules, %d alerts" % (len(series), nrules, fired)
+    print "  indexed : %8.3fs %10.0f obs/sec" % (indexed, len(series) / indexed)
+    print "  scan    : %8.3fs %10.0f obs/sec" % (scan, len(series) / scan)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Compare the size of a synthetic Vantage-like LOOP stream sent as
+    full observations against the same stream sent as keyframes and
+    deltas.
+
+    python benchmarks/delta_bench.py [hours]
+'''
+
+import json
+import random
+import sys
+
+from wxconnector.measurement import WxObservation
+from wxconnector.delta import DeltaEncoder, DeltaDecoder
+
+def vantage_series(hours, seed = 1):
+    ''' Yield one observation every 2 seconds. Each sensor only updates
+        at the rate the console refreshes it and values are quantised
+        to the resolution the LOOP packet reports.
+    '''
+    rnd = random.Random(seed)
+    state = {'temperature': 52.0, 'barometer': 29.92, 'humidity': 81,
+             'wind_speed': 6, 'wind_direction': 225, 'uv': 0.4,
+             'solar_radiation': 120, 'rain_rate': 0.0}
+    # (interval in seconds, step, units, decimal places)
+    sensors = {
+        'temperature': (10, 0.1, 'F', 1),
+        'barometer': (60, 0.001, 'inHg', 3),
+        'humidity': (50, 1, '%', 0),
+        'wind_speed': (2, 1, 'mph', 0),
+        'wind_direction': (2, 1, 'deg', 0),
+        'uv': (50, 0.1, 'index', 1),
+        'solar_radiation': (50, 1, 'W/m2', 0),
+        'rain_rate': (20, 0.01, 'in/hr', 2),
+    }
+    when = 1350000000
+    for i in range(int(hours * 1800)):
+        obs = WxObservation(when)
+        for k, (interval, step, units, dp) in sensors.items():
+            if i * 2 % interval == 0 and rnd.random() < 0.5:
+                state[k] = round(state[k] + rnd.choice((-step, step)), dp)
+            obs.add_measurement(k, state[k], units)
+        yield obs
+        when += 2
+
+def compare(hours, keyframe_interval):
+    enc = DeltaEncoder(keyframe_interval)
+    dec = DeltaDecoder()
+    full_bytes = delta_bytes = count = 0
+    for obs in vantage_series(hours):
+        full_bytes += len(json.dumps(obs.as_list(), separators=(',', ':')))
+        frame = json.dumps(enc.encode(obs), separators=(',', ':'))
+        delta_bytes += len(frame)
+        out = dec.decode(json.loads(frame))
+        assert out.when == obs.when and \
+                     sorted(out.as_list()[1]) == sorted(obs.as_list()[1])
+        count += 1
+    print "%d observations, keyframe every %d" % (count, keyframe_interval)
+    print "  full  : %10d bytes %8.1f bytes/obs" % (full_bytes,
+                                                float(full_bytes) / count)
+    print "  delta : %10d bytes %8.1f bytes/obs" % (delta_bytes,
+                                                float(delta_bytes) / count)
+    print "  ratio : %10.1fx" % (float(full_bytes) / delta_bytes)
+
+def main(hours = 24):
+    for keyframe_interval in (30, 300):
+        compare(hours, keyframe_interval)
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 24)
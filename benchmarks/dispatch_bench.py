@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Time feeding many accumulators directly against feeding them
+    through an ObservationDispatcher.
+
+    python benchmarks/dispatch_bench.py [accumulators]
+'''
+
+import os
+import sys
+import time
+
+from wxconnector.accumulator import BasicAccumulator
+from wxconnector.dispatch import ObservationDispatcher
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from delta_bench import vantage_series
+
+class WindAccumulator(BasicAccumulator):
+    HILO = ['wind_speed']
+    AVG = []
+
+class RainAccumulator(BasicAccumulator):
+    HILO = ['rain_rate']
+    AVG = ['rain_rate']
+
+def make_accumulators(n):
+    kinds = [BasicAccumulator, WindAccumulator, RainAccumulator]
+    return [kinds[i % len(kinds)]() for i in range(n)]
+
+def main(naccumulators = 30, hours = 2):
+    series = list(vantage_series(hours))
+
+    accs = make_accumulators(naccumulators)
+    start = time.time()
+    for obs in series:
+        for acc in accs:
+            acc.add_observation(obs)
+    direct = time.time() - start
+
+    disp = ObservationDispatcher(make_accumulators(naccumulators))
+    start = time.time()
+    for obs in series:
+        disp.add_observation(obs)
+    routed = time.time() - start
+
+    print "%d observations, %d accumulators" % (len(series), naccumulators)
+    print "  direct     : %8.3fs" % direct
+    print "  dispatcher : %8.3fs" % routed
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
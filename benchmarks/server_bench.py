@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Load test the query server. A number of client threads make requests
+    over keep-alive connections for a few seconds while observations
+    keep arriving, and the requests per second are reported.
+
+    python benchmarks/server_bench.py [clients] [seconds]
+'''
+
+import httplib
+import os
+import sys
+import threading
+import time
+
+from wxconnector.accumulator import BasicAccumulator
+from wxconnector.server import ResponseCache, WxQueryServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from delta_bench import vantage_series
+
+PATHS = ['/current', '/current?units=imperial', '/summary',
+         '/summary?units=imperial']
+
+def client(port, seconds, conditional, counts):
+    conn = httplib.HTTPConnection('127.0.0.1', port)
+    etags = {}
+    count = 0
+    stop = time.time() + seconds
+    while time.time() < stop:
+        path = PATHS[count % len(PATHS)]
+        headers = {}
+        if conditional and path in etags:
+            headers['If-None-Match'] = etags[path]
+        conn.request('GET', path, headers = headers)
+        resp = conn.getresponse()
+        resp.read()
+        etags[path] = resp.getheader('ETag')
+        count += 1
+    conn.close()
+    counts.append(count)
+
+def feeder(cache, seconds):
+    ''' One observation every 2 seconds, as a Vantage console sends. '''
+    stop = time.time() + seconds
+    for obs in vantage_series(1):
+        cache.add_observation(obs)
+        if time.time() > stop:
+            break
+        time.sleep(2)
+
+def run(port, cache, clients, seconds, conditional):
+    counts = []
+    threads = [threading.Thread(target = client,
+                                args = (port, seconds, conditional, counts))
+               for n in range(clients)]
+    threads.append(threading.Thread(target = feeder, args = (cache, seconds)))
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / (time.time() - start)
+
+def main(clients = 4, seconds = 5):
+    cache = ResponseCache({'today': BasicAccumulator()})
+    server = WxQueryServer(('127.0.0.1', 0), cache)
+    thread = threading.Thread(target = server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    port = server.server_address[1]
+
+    print "%d clients, %d seconds each" % (clients, seconds)
+    print "  200 responses : %8.0f requests/sec" % run(port, cache, clients,
+                                                       seconds, False)
+    print "  conditional   : %8.0f requests/sec" % run(port, cache, clients,
+                                                       seconds, True)
+    server.shutdown()
+    server.server_close()
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import sys
+import unittest
+
+from wxconnector.measurement import WxObservation
+from wxconnector.alert import AlertEngine, ThresholdRule, RateRule, \
+                                                   RISING, FALLING, BOTH
+
+def _obs(when, what, value, units):
+    obs = WxObservation(when)
+    obs.add_measurement(what, value, units)
+    return obs
+
+def _names(alerts):
+    return sorted(a.rule.name for a in alerts)
+
+class TestAlerts(unittest.TestCase):
+    def test_001_threshold(self):
+        eng = AlertEngine()
+        eng.add_rule(ThresholdRule('gale', 'wind_speed', 40, 'mph'))
+        eng.add_rule(ThresholdRule('storm', 'wind_speed', 55, 'mph'))
+        eng.add_rule(ThresholdRule('calm', 'wind_speed', 2, 'mph', FALLING))
+        self.assertEqual(_names(eng.add_observation(
+                                    _obs(100, 'wind_speed', 10, 'mph'))), [])
+        self.assertEqual(_names(eng.add_observation(
+                          _obs(102, 'wind_speed', 60, 'mph'))), ['gale', 'storm'])
+        self.assertEqual(_names(eng.add_observation(
+                                    _obs(104, 'wind_speed', 45, 'mph'))), [])
+        self.assertEqual(_names(eng.add_observation(
+                                    _obs(106, 'wind_speed', 1, 'mph'))), ['calm'])
+        # Exactly on the threshold is not above it.
+        self.assertEqual(_names(eng.add_observation(
+                                    _obs(108, 'wind_speed', 40, 'mph'))), [])
+        alerts = eng.add_observation(_obs(110, 'wind_speed', 41, 'mph'))
+        self.assertEqual(_names(alerts), ['gale'])
+        self.assertEqual(alerts[0].when, 110)
+        self.assertEqual(alerts[0].value.value, 41)
+
+    def test_002_initial_and_units(self):
+        eng = AlertEngine()
+        eng.add_rule(ThresholdRule('freezing', 'temperature', 0, 'C', BOTH))
+        eng.add_rule(ThresholdRule('frost', 'temperature', 36, 'F', FALLING))
+        eng.add_rule(ThresholdRule('warm', 'temperature', 20, 'C'))
+        # 35.6F is 2C, already below the frost threshold of 36F.
+        self.assertEqual(_names(eng.add_observation(
+                               _obs(100, 'temperature', 35.6, 'F'))), ['frost'])
+        self.assertEqual(_names(eng.add_observation(
+                             _obs(102, 'temperature', -0.5, 'C'))), ['freezing'])
+        self.assertEqual(_names(eng.add_observation(
+                               _obs(104, 'temperature', 33, 'F'))), ['freezing'])
+        # A reading that cannot be converted is skipped without losing
+        # alerts for the other measurements in the observation.
+        eng.add_rule(ThresholdRule('gale', 'wind_speed', 40, 'mph'))
+        obs = _obs(106, 'temperature', 3, 'mph')
+        obs.add_measurement('wind_speed', 20, 'mph')
+        self.assertEqual(_names(eng.add_observation(obs)), [])
+        obs = _obs(108, 'temperature', 3, 'mph')
+        obs.add_measurement('wind_speed', 50, 'mph')
+        self.assertEqual(_names(eng.add_observation(obs)), ['gale'])
+        self.assertEqual(eng.rejected, {'temperature': 2})
+        self.assertEqual(_names(eng.add_observation(
+                               _obs(110, 'temperature', -1, 'C'))), ['freezing'])
+
+    def test_003_rate(self):
+        eng = AlertEngine()
+        eng.add_rule(RateRule('falling', 'barometer', -3, 3 * 3600, 'hPa'))
+        alerts = []
+        # Steady, then falling 1.2hPa an hour, then steady again.
+        values = [1010.0] * 4 + [1010.0 - 1.2 * i for i in range(1, 5)] + \
+                 [1005.2] * 6
+        for n, hpa in enumerate(values):
+            inhg = hpa / 33.86388640341
+            alerts.extend(eng.add_observation(
+                               _obs((n + 1) * 3600, 'barometer', inhg, 'inHg')))
+        self.assertEqual([a.when / 3600 - 1 for a in alerts], [6])
+        eng.add_rule(ThresholdRule('low', 'barometer', 29, 'inHg', FALLING))
+        # A second sharp fall re-triggers the re-armed rate rule too.
+        self.assertEqual(_names(eng.add_observation(
+               _obs(16 * 3600, 'barometer', 980, 'hPa'))), ['falling', 'low'])
+
+if __name__ == '__main__':
+    unittest.main()
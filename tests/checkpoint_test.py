@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from wxconnector import WXUNITS
+from wxconnector.measurement import WxObservation
+from wxconnector.accumulator import BasicAccumulator
+from wxconnector.checkpoint import Checkpointer
+
+def _observations(count):
+    for i in range(count):
+        obs = WxObservation(1000 + i * 60)
+        obs.add_measurement('temperature', 10 + (i % 7) * 0.3, 'C')
+        obs.add_measurement('barometer', 29.9 + (i % 5) * 0.01, 'inHg')
+        yield obs
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'today.ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_001_snapshot(self):
+        ba = BasicAccumulator()
+        for obs in _observations(10):
+            ba.add_observation(obs)
+        copy = BasicAccumulator()
+        copy.restore(ba.snapshot())
+        self.assertEqual(copy.nobs, 10)
+        self.assertEqual(copy.timespan, ba.timespan)
+        (val, when) = copy.get_highest('temperature')
+        self.assertEqual((val.value, when), (11.8, 1360))
+        self.assertEqual(val.units, WXUNITS['C'])
+        self.assertEqual(copy.avgs['barometer'].avg().value,
+                         ba.avgs['barometer'].avg().value)
+
+    def test_002_restart(self):
+        observations = list(_observations(30))
+        expected = BasicAccumulator()
+        for obs in observations:
+            expected.add_observation(obs)
+
+        ck = Checkpointer(BasicAccumulator(), self.filename, interval = 300)
+        self.assertFalse(ck.restore())
+        for obs in observations[:23]:
+            ck.add_observation(obs)
+        # Last checkpoint was written after the observation at 2200.
+        self.assertEqual(ck.saved_at, 2200)
+
+        ck = Checkpointer(BasicAccumulator(), self.filename, interval = 300)
+        self.assertTrue(ck.restore())
+        self.assertEqual(ck.replay(observations), 9)
+        acc = ck.accumulator
+        self.assertEqual(acc.nobs, expected.nobs)
+        self.assertEqual(acc.first, expected.first)
+        for k in ('temperature', 'barometer'):
+            self.assertEqual(acc.get_lowest(k)[0].value,
+                             expected.get_lowest(k)[0].value)
+            self.assertEqual(acc.get_lowest(k)[1], expected.get_lowest(k)[1])
+            self.assertEqual(acc.avgs[k].count, expected.avgs[k].count)
+            self.assertAlmostEqual(acc.avgs[k].avg().value,
+                                   expected.avgs[k].avg().value)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import sys
+import unittest
+
+from wxconnector.measurement import WxObservation
+from wxconnector.delta import DeltaEncoder, DeltaDecoder, DeltaStreamError
+
+def _obs(when, measurements):
+    obs = WxObservation(when)
+    for m in measurements:
+        obs.add_measurement(*m)
+    return obs
+
+class TestDelta(unittest.TestCase):
+    def test_001_frames(self):
+        enc = DeltaEncoder(keyframe_interval = 6)
+        series = [
+          _obs(100, [['temperature', 10.5, 'C'], ['barometer', 1000.2, 'hPa']]),
+          _obs(102, [['temperature', 10.6, 'C'], ['barometer', 1000.2, 'hPa']]),
+          _obs(104, [['temperature', 10.6, 'C']]),
+          _obs(106, [['temperature', 51.1, 'F'], ['humidity', 80, '%']]),
+          _obs(108, [['temperature', 51.1, 'F'], ['barometer', 1000.3, 'hPa'],
+                     ['humidity', 80, '%']]),
+          _obs(110, [['temperature', 51.1, 'F']]),
+        ]
+        frames = [enc.encode(o) for o in series]
+        self.assertEqual(frames[0], ['K', 100, [['barometer', 1000.2, 'hPa'],
+                                                ['temperature', 10.5, 'C']]])
+        self.assertEqual(frames[1], ['D', 2, [1, 10.6]])
+        self.assertEqual(frames[2], ['D', 2, [], [], [0]])
+        self.assertEqual(frames[3], ['D', 2, [], [['humidity', 80, '%'],
+                                                  [1, 51.1, 'F']]])
+        self.assertEqual(frames[4], ['D', 2, [], [[0, 1000.3, 'hPa']]])
+        self.assertEqual(frames[5], ['D', 2, [], [], [0, 2]])
+        self.assertEqual(enc.encode(series[0])[0], 'K')
+        enc.reset()
+        self.assertEqual(enc.encode(series[3])[0], 'K')
+
+    def test_002_roundtrip(self):
+        enc = DeltaEncoder(keyframe_interval = 5)
+        dec = DeltaDecoder()
+        for i in range(20):
+            obs = _obs(100 + i * 2, [['temperature', 10 + i // 3, 'C'],
+                                     ['humidity', 80, '%'],
+                                     ['wind_speed', i % 4, 'mph']])
+            if i % 7 == 0:
+                obs.add_measurement('uv', 1.2, 'index')
+            frame = json.loads(json.dumps(enc.encode(obs)))
+            out = dec.decode(frame)
+            self.assertEqual(out.when, obs.when)
+            self.assertEqual(sorted(out.as_list()[1]),
+                             sorted(obs.as_list()[1]))
+
+    def test_003_unsynchronised(self):
+        dec = DeltaDecoder()
+        self.assertFalse(dec.synchronised)
+        self.assertRaises(DeltaStreamError, dec.decode, ['D', 100, []])
+        self.assertRaises(DeltaStreamError, dec.decode, ['X', 100, []])
+        dec.decode(['K', 100, [['humidity', 80, '%']]])
+        self.assertTrue(dec.synchronised)
+        obs = dec.decode(['D', 2, []])
+        self.assertEqual((obs.when, obs['humidity'].value), (102, 80))
+
+    def test_004_inexact_offset(self):
+        # An offset that would not add back to the same time forces a
+        # keyframe rather than losing precision.
+        enc = DeltaEncoder()
+        dec = DeltaDecoder()
+        for when in (1350000000.1, 1350000002.3, 1350000004.7):
+            frame = enc.encode(_obs(when, [['humidity', 80, '%']]))
+            self.assertEqual(dec.decode(frame).when, when)
+
+if __name__ == '__main__':
+    unittest.main()
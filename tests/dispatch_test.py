@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import sys
+import unittest
+
+from wxconnector.measurement import WxObservation
+from wxconnector.accumulator import BasicAccumulator
+from wxconnector.dispatch import ObservationDispatcher
+
+class RainAccumulator(BasicAccumulator):
+    HILO = ['rain_rate']
+    AVG = []
+
+def _observations():
+    for i in range(10):
+        obs = WxObservation(100 + i * 2)
+        obs.add_measurement('temperature', 10 + (i % 4) * 0.5, 'C')
+        obs.add_measurement('barometer', 1000 + i * 0.1, 'hPa')
+        obs.add_measurement('rain_rate', (i * 7) % 5, 'mm')
+        obs.add_measurement('wind_direction', 90, 'deg')
+        yield obs
+
+class TestDispatch(unittest.TestCase):
+    def test_001_routes(self):
+        daily, rain = BasicAccumulator(), RainAccumulator()
+        disp = ObservationDispatcher([daily, rain])
+        self.assertEqual(len(disp.routes_for('temperature')), 2)
+        self.assertEqual(len(disp.routes_for('rain_rate')), 1)
+        self.assertEqual(disp.routes_for('wind_direction'), ())
+        disp.unregister(daily)
+        self.assertEqual(disp.routes_for('temperature'), ())
+
+    def test_002_matches_direct(self):
+        direct = [BasicAccumulator(), RainAccumulator()]
+        routed = [BasicAccumulator(), RainAccumulator()]
+        disp = ObservationDispatcher(routed)
+        for obs in _observations():
+            for acc in direct:
+                acc.add_observation(obs)
+            disp.add_observation(obs)
+        for a, b in zip(direct, routed):
+            self.assertEqual(a.nobs, b.nobs)
+            self.assertEqual(a.timespan, b.timespan)
+            self.assertEqual(sorted(a.hilos.keys()), sorted(b.hilos.keys()))
+            for k in a.hilos:
+                self.assertEqual(a.get_highest(k)[0].value,
+                                 b.get_highest(k)[0].value)
+                self.assertEqual(a.get_highest(k)[1], b.get_highest(k)[1])
+                self.assertEqual(a.get_lowest(k)[0].value,
+                                 b.get_lowest(k)[0].value)
+                self.assertEqual(a.get_lowest(k)[1], b.get_lowest(k)[1])
+            for k in a.avgs:
+                self.assertEqual(a.avgs[k].avg().value, b.avgs[k].avg().value)
+        self.assertEqual(routed[1].get_highest('rain_rate')[0].value, 4)
+        self.assertEqual(routed[1].avgs, {})
+
+if __name__ == '__main__':
+    unittest.main()
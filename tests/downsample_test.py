@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import math
+import sys
+import unittest
+
+from wxconnector.measurement import WxObservation
+from wxconnector.accumulator import _PlainHiLo
+from wxconnector.downsample import lttb, minmax, downsample, LTTB, MINMAX, \
+                                                                     numpy
+
+def _series(count):
+    x = [1000 + i * 2 for i in range(count)]
+    y = [round(10 + 5 * math.sin(i / 50.0) + (i % 7) * 0.1, 1)
+                                                          for i in range(count)]
+    # A short spike and dip that bucket averaging would lose.
+    y[333] = 40.0
+    y[777] = -12.5
+    return x, y
+
+def _observations(x, y):
+    for when, value in zip(x, y):
+        obs = WxObservation(when)
+        obs.add_measurement('temperature', value, 'C')
+        yield obs
+
+class TestDownsample(unittest.TestCase):
+    def test_001_lttb(self):
+        x, y = _series(1000)
+        idx = lttb(x, y, 50)
+        self.assertEqual(len(idx), 50)
+        self.assertEqual(idx, sorted(idx))
+        self.assertEqual((idx[0], idx[-1]), (0, 999))
+        self.assertTrue(333 in idx and 777 in idx)
+        self.assertEqual(lttb(x[:10], y[:10], 20), list(range(10)))
+        self.assertRaises(ValueError, lttb, x, y, 2)
+
+    def test_002_minmax(self):
+        x, y = _series(1000)
+        idx = minmax(x, y, 100)
+        self.assertTrue(len(idx) <= 100)
+        self.assertEqual(idx, sorted(idx))
+        self.assertTrue(333 in idx and 777 in idx)
+
+    def test_003_extremes_same_bucket(self):
+        x = list(range(100))
+        y = [0.0] * 100
+        y[50], y[51] = 9.0, -9.0
+        idx = lttb(x, y, 10)
+        self.assertTrue(50 in idx and 51 in idx)
+        self.assertEqual(len(idx), 11)
+
+    def test_004_stream(self):
+        x, y = _series(5000)
+        y[4000] = 40.0
+        hilo = _PlainHiLo()
+        for obs in _observations(x, y):
+            hilo.check(obs['temperature'], obs.when)
+        for mode, n in ((LTTB, 100), (MINMAX, 100)):
+            out = downsample(_observations(x, y), 'temperature', n, mode,
+                             start = x[0], end = x[-1])
+            self.assertTrue(len(out) <= n + 1)
+            whens = [o[0] for o in out]
+            self.assertEqual(whens, sorted(whens))
+            self.assertTrue((hilo.hi_when, hilo.hi_value.value) in
+                            [(o[0], o[1].value) for o in out])
+            self.assertTrue((hilo.lo_when, hilo.lo_value.value) in
+                            [(o[0], o[1].value) for o in out])
+            self.assertEqual(out[0][1].units, hilo.hi_value.units)
+        out = downsample(list(_observations(x, y)), 'temperature', 100)
+        self.assertEqual((out[0][0], out[-1][0]), (x[0], x[-1]))
+        self.assertEqual(downsample([], 'temperature', 10), [])
+
+    def test_005_units(self):
+        obs = []
+        for i, (value, units) in enumerate([(10, 'C'), (68, 'F'), (5, 'C')]):
+            o = WxObservation(100 + i)
+            o.add_measurement('temperature', value, units)
+            obs.append(o)
+        out = downsample(obs, 'temperature', 3)
+        self.assertEqual([o[1].value for o in out], [10, 20, 5])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_006_vectorised(self):
+        x, y = _series(1000)
+        self.assertEqual(lttb(numpy.array(x), numpy.array(y), 50),
+                         lttb(x, y, 50))
+        self.assertEqual(minmax(numpy.array(x), numpy.array(y), 50),
+                         minmax(x, y, 50))
+
+    def test_007_last_sample(self):
+        x = list(range(30))
+        y = [0.0] * 30
+        y[29] = 99.0
+        self.assertTrue(29 in minmax(x, y, 22))
+        x = list(range(61))
+        y = [0.0] * 61
+        y[59] = 99.0
+        idx = lttb(x, y, 44)
+        self.assertTrue(59 in idx and 60 in idx)
+
+    def test_008_extremes_kept(self):
+        for size in range(5, 400, 7):
+            x = list(range(size))
+            for n in (3, 4, 13, 44, 100):
+                for pos in (0, 1, size // 2, size - 2, size - 1):
+                    y = [float(i % 3) for i in range(size)]
+                    y[pos] = 99.0
+                    y[size - 1 - pos] = -99.0
+                    for idx in (lttb(x, y, n), minmax(x, y, n)):
+                        self.assertTrue(pos in idx, (size, n, pos))
+                        self.assertTrue(size - 1 - pos in idx, (size, n, pos))
+                    idx = lttb(x, y, n)
+                    self.assertEqual((idx[0], idx[-1]), (0, size - 1))
+
+if __name__ == '__main__':
+    unittest.main()
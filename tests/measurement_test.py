@@ -41,6 +41,10 @@ class TestMeasurements(unittest.TestCase):
         self.assertEqual(len(aslist[1]), 1)
         asdict = obs.as_dict()
         self.assertEqual(asdict['when'], 100)
+        copy = WxObservation.from_list(aslist)
+        self.assertEqual(copy.when, 100)
+        self.assertEqual(copy['temperature'].value, 38.5)
+        self.assertEqual(copy['temperature'].units, WXUNITS['F'])
         
         obs.remove_measurement('temperature')
         self.assertEqual(obs.count, 0)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import httplib
+import json
+import sys
+import threading
+import unittest
+
+from wxconnector.measurement import WxObservation
+from wxconnector.accumulator import BasicAccumulator
+from wxconnector.server import ResponseCache, WxQueryServer
+
+def _obs(when, temperature):
+    obs = WxObservation(when)
+    obs.add_measurement('temperature', temperature, 'C')
+    obs.add_measurement('barometer', 1013.2, 'hPa')
+    obs.add_measurement('humidity', 81, '%')
+    return obs
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache({'today': BasicAccumulator()})
+        self.server = WxQueryServer(('127.0.0.1', 0), self.cache)
+        self.thread = threading.Thread(target = self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.conn = httplib.HTTPConnection('127.0.0.1',
+                                           self.server.server_address[1])
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get(self, path, etag = None):
+        headers = {'If-None-Match': etag} if etag else {}
+        self.conn.request('GET', path, headers = headers)
+        resp = self.conn.getresponse()
+        return resp.status, resp.getheader('ETag'), resp.read()
+
+    def test_001_current(self):
+        self.assertEqual(self._get('/current')[0], 404)
+        self.cache.add_observation(_obs(100, 10.5))
+        status, etag, body = self._get('/current')
+        self.assertEqual(status, 200)
+        data = json.loads(body)
+        self.assertEqual(data['when'], 100)
+        self.assertEqual(data['measurements']['temperature'],
+                         {'value': 10.5, 'units': 'C', 'text': '10.5C'})
+        data = json.loads(self._get('/current?units=imperial')[2])
+        self.assertEqual(data['measurements']['temperature']['value'], 50.9)
+        self.assertEqual(data['measurements']['barometer']['text'],
+                                                                 '29.92inHg')
+        self.assertEqual(data['measurements']['humidity']['value'], 81)
+        self.assertEqual(self._get('/current?units=cubits')[0], 404)
+        self.assertEqual(self._get('/nothing')[0], 404)
+
+    def test_002_etag(self):
+        self.cache.add_observation(_obs(100, 10.5))
+        status, etag, body = self._get('/summary')
+        self.assertEqual(status, 200)
+        self.assertTrue(self.cache.get('/summary', 'metric') is
+                        self.cache.get('/summary', 'metric'))
+        self.assertEqual(self._get('/summary', etag), (304, etag, ''))
+
+        self.cache.add_observation(_obs(102, 9.5))
+        status, etag2, body = self._get('/summary', etag)
+        self.assertEqual(status, 200)
+        self.assertNotEqual(etag, etag2)
+        today = json.loads(body)['today']
+        self.assertEqual(today['nobs'], 2)
+        self.assertEqual(today['lows']['temperature']['value'], 9.5)
+        self.assertEqual(today['lows']['temperature']['when'], 102)
+        self.assertEqual(today['highs']['temperature']['when'], 100)
+        self.assertEqual(today['averages']['temperature']['value'], 10.0)
+
+if __name__ == '__main__':
+    unittest.main()
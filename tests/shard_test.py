@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from wxconnector.measurement import WxObservation
+from wxconnector.accumulator import BasicAccumulator
+from wxconnector.shard import StationRegistry, _HashRing, _Worker, \
+                             _checkpoint_name
+
+STATIONS = ['station%02d' % n for n in range(12)]
+
+def _feed(registry, stations, count = 20):
+    for i in range(count):
+        for n, station in enumerate(stations):
+            obs = WxObservation(1000 + i * 60)
+            obs.add_measurement('temperature', n + (i % 5) * 0.5, 'C')
+            registry.add_observation(station, obs)
+
+def _batch(station, whens):
+    batch = []
+    for when in whens:
+        obs = WxObservation(when)
+        obs.add_measurement('temperature', when / 100.0, 'C')
+        batch.append((station, obs.as_list()))
+    return batch
+
+class TestShard(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_001_ring(self):
+        ring = _HashRing(range(3))
+        owners = [ring.node_for(s) for s in STATIONS]
+        self.assertEqual(owners, [ring.node_for(s) for s in STATIONS])
+        self.assertEqual(sorted(set(owners)), [0, 1, 2])
+        # Adding a node only moves stations onto the new node.
+        bigger = _HashRing(range(4))
+        for s, owner in zip(STATIONS, owners):
+            self.assertTrue(bigger.node_for(s) in (owner, 3))
+
+    def test_002_queries(self):
+        reg = StationRegistry(workers = 3, batch_size = 7)
+        try:
+            _feed(reg, STATIONS)
+            for n, station in enumerate(STATIONS):
+                (val, when) = reg.get_highest(station, 'temperature')
+                self.assertEqual((val.value, when), (n + 2.0, 1240))
+                (val, when) = reg.get_lowest(station, 'temperature')
+                self.assertEqual((val.value, when), (n, 1000))
+            self.assertEqual(reg.get_highest('unknown', 'temperature'),
+                                                                    (None, 0))
+        finally:
+            reg.close()
+
+    def test_003_restart(self):
+        reg = StationRegistry(workers = 3, checkpoint_dir = self.tmpdir,
+                                                            interval = 600)
+        try:
+            # Each station is checkpointed at 1000 and 1600.
+            _feed(reg, STATIONS)
+            for station in STATIONS:
+                obs = WxObservation(2150)
+                obs.add_measurement('temperature', 99.0, 'C')
+                reg.add_observation(station, obs)
+            reg.flush()
+            victim = reg.worker_for(STATIONS[0])
+            owned = [s for s in STATIONS if reg.worker_for(s) == victim]
+            reg.get_highest(owned[0], 'temperature')
+            for station in owned:
+                self.assertTrue(os.path.exists(os.path.join(self.tmpdir,
+                                                _checkpoint_name(station))))
+                # Only the readings after 1600 are held for resending.
+                self.assertEqual(len(reg._unsaved[victim][station][1]), 10)
+
+            reg._procs[victim].terminate()
+            reg._procs[victim].join()
+            self.assertFalse(reg.is_alive(victim))
+
+            for n, station in enumerate(STATIONS):
+                (val, when) = reg.get_highest(station, 'temperature')
+                self.assertEqual((val.value, when), (99.0, 2150))
+                # The lows are only in the checkpoints.
+                (val, when) = reg.get_lowest(station, 'temperature')
+                self.assertEqual((val.value, when), (n, 1000))
+            self.assertEqual(reg.restarts, 1)
+            self.assertTrue(reg.is_alive(victim))
+        finally:
+            reg.close()
+
+    def test_004_worker_checkpoints(self):
+        station = '../evil station'
+        worker = _Worker(BasicAccumulator, self.tmpdir, 600)
+        self.assertEqual(worker.query('get_highest', 'unknown', 'temperature'),
+                                                                    (None, 0))
+        self.assertEqual(worker.stations, {})
+        self.assertEqual(os.listdir(self.tmpdir), [])
+        # Late and same second readings are accepted.
+        worker.add_observations(_batch(station, [1000, 1060, 1030, 1060]))
+        self.assertEqual(worker.stations[station].nobs, 4)
+        worker.close()
+        files = os.listdir(self.tmpdir)
+        self.assertEqual(len(files), 1)
+        self.assertFalse('/' in files[0] or files[0].startswith('.'))
+
+        worker = _Worker(BasicAccumulator, self.tmpdir, 600)
+        self.assertEqual(worker.query('get_lowest', station, 'temperature'),
+                         ([10.0, 'C'], 1000))
+        # Readings already in the checkpoint are skipped while catching up,
+        # after which late readings are accepted again.
+        worker.add_observations(_batch(station, [1030, 1060, 1120, 1090]))
+        self.assertEqual(worker.stations[station].nobs, 6)
+
+if __name__ == '__main__':
+    unittest.main()
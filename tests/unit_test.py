@@ -76,5 +76,12 @@ class TestCreation(unittest.TestCase):
         self.assertEqual(mb.format_value('1003.1'), '1003.1mbar')
         self.assertEqual(mb.format_value(1003.1), '1003.1mbar')
 
+    def test_005_unrounded(self):
+        cats, units = make_unit_data()
+        self.assertAlmostEqual(units['hPa'].convert(3, 'inHg'), 0.0885902, 6)
+        self.assertEqual(units['C'].convert(100, 'F'), 212)
+        self.assertEqual(units['C'].convert(12.34, 'C'), 12.34)
+        self.assertRaises(WxConversionUnavailable, units['C'].convert, 1, 'mph')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+from wxconnector.utils.crc16 import crc_ccitt_16
+from wxconnector.devices.vantage import ArchiveDownloader, VantageError, \
+               decode_archive_record, record_stamp, ACK, NAK, ESC, PAGE_SIZE
+
+def make_record(date, tm, temp):
+    data = struct.pack('<HHhhhHHHHHhBBBBBBBB', date, tm, temp, temp, temp,
+                       2, 0, 29920, 32767, 0, 700, 40, 85, 4, 9, 3, 3, 12, 0)
+    return data + '\x00' * (52 - len(data))
+
+def day_stamp(day, tm):
+    return day + 10 * 32 + 12 * 512, tm
+
+class FakeVantage(object):
+    ''' Just enough of a console to answer DMPAFT. '''
+    def __init__(self, records, corrupt = ()):
+        self.records = records
+        self.corrupt = list(corrupt)
+        self.out = ''
+        self.state = 'idle'
+        self.sent = []
+
+    def read(self, n):
+        data, self.out = self.out[:n], self.out[n:]
+        return data
+
+    def _page(self):
+        recs = self.pages[self.npage]
+        page = chr(self.npage) + ''.join(recs) + '\x00' * 4
+        page += struct.pack('>H', crc_ccitt_16(page))
+        if self.npage in self.corrupt:
+            self.corrupt.remove(self.npage)
+            page = page[:10] + '\xff' + page[11:]
+        return page
+
+    def write(self, data):
+        self.sent.append(data)
+        if data == 'DMPAFT\n':
+            self.out += ACK
+            self.state = 'stamp'
+        elif self.state == 'stamp':
+            if crc_ccitt_16(data) != 0:
+                self.out += NAK
+                return
+            since = struct.unpack('<HH', data[:4])
+            idx = len(self.records)
+            for n, r in enumerate(self.records):
+                if record_stamp(r) > since:
+                    idx = n
+                    break
+            start = idx - idx % 5
+            recs = self.records[start:]
+            recs += ['\xff' * 52] * (-len(recs) % 5)
+            self.pages = [recs[i:i + 5] for i in range(0, len(recs), 5)]
+            hdr = struct.pack('<HH', len(self.pages), idx % 5)
+            self.out += ACK + hdr + struct.pack('>H', crc_ccitt_16(hdr))
+            self.state = 'header'
+            self.npage = -1
+        elif self.state == 'header' and data in (ACK, NAK):
+            if data == ACK:
+                self.npage += 1
+            if self.npage < len(self.pages):
+                self.out += self._page()
+            else:
+                self.state = 'idle'
+        elif data == ESC:
+            self.state = 'idle'
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.resume = os.path.join(self.tmpdir, 'resume')
+        self.records = [make_record(*(day_stamp(1 + n // 24, (n % 24) * 100)
+                                      + (500 + n,))) for n in range(23)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_001_decode(self):
+        obs = decode_archive_record(self.records[0])
+        self.assertEqual(obs['temperature'].value, 50.0)
+        self.assertEqual(obs['barometer'].value, 29.92)
+        self.assertEqual(obs['humidity'].value, 85)
+        self.assertEqual(obs['wind_direction'].value, 67.5)
+        self.assertEqual(obs['uv'].value, 1.2)
+        self.assertEqual(obs['solar_radiation'], None)
+        self.assertEqual(record_stamp('\xff' * 52), None)
+
+    def test_002_download(self):
+        stored = []
+        console = FakeVantage(self.records, corrupt = [1])
+        dl = ArchiveDownloader(console, stored.extend, self.resume)
+        self.assertEqual(dl.download(), 23)
+        self.assertEqual([o['temperature'].value for o in stored],
+                         [50.0 + n / 10.0 for n in range(23)])
+        self.assertTrue(NAK in console.sent)
+        self.assertEqual(dl.resume_point, record_stamp(self.records[-1]))
+        # Nothing new, nothing downloaded.
+        self.assertEqual(dl.download(), 0)
+
+    def test_003_resume(self):
+        records = [make_record(*(day_stamp(1 + n // 24, (n % 24) * 100)
+                                 + (500 + n,))) for n in range(40)]
+        stored = []
+        def failing(observations):
+            if len(stored) >= 5:
+                raise IOError("database went away")
+            stored.extend(observations)
+        # With a queue of 1 the fetch loop can be at most two pages ahead
+        # of the worker, so a failure storing the second page is always
+        # seen while 8 pages are still being fetched.
+        console = FakeVantage(records)
+        dl = ArchiveDownloader(console, failing, self.resume, queue_size = 1)
+        self.assertRaises(IOError, dl.download)
+        self.assertEqual(len(stored), 5)
+        self.assertEqual(console.sent[-1], ESC)
+
+        records.append(make_record(*(day_stamp(2, 2300) + (600,))))
+        dl = ArchiveDownloader(FakeVantage(records), stored.extend,
+                                                                self.resume)
+        # Only the records after the last stored page are downloaded.
+        self.assertEqual(dl.download(), 36)
+        self.assertEqual(len(stored), 41)
+        self.assertEqual(len(set(o.when for o in stored)), 41)
+
+    def test_004_bad_pages(self):
+        console = FakeVantage(self.records, corrupt = [0] * 4)
+        dl = ArchiveDownloader(console, lambda obs: None, retries = 3)
+        self.assertRaises(VantageError, dl.download)
+        self.assertEqual(console.sent.count(NAK), 3)
+        self.assertEqual(console.sent[-1], ESC)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,6 +28,12 @@ from wxconnector.measurement import *
 class HiLoIncompatibleType(Exception):
     pass
 
+def _snapshot_measurement(value):
+    return value.as_list() if value else None
+
+def _restore_measurement(data):
+    return WxMeasurement(*data) if data else None
+
 def _convert_if_required(val1, value):
     if value.units != val1.units:
         if value.units.category != val1.units.category:
@@ -72,6 +78,19 @@ class _PlainHiLo(object):
             self.hi_value.value = _val
             self.hi_when = when
 
+    def snapshot(self):
+        return [_snapshot_measurement(self.lo_value), self.lo_when,
+                _snapshot_measurement(self.hi_value), self.hi_when]
+
+    @classmethod
+    def from_snapshot(cls, data):
+        hilo = cls()
+        hilo.lo_value = _restore_measurement(data[0])
+        hilo.lo_when = data[1]
+        hilo.hi_value = _restore_measurement(data[2])
+        hilo.hi_when = data[3]
+        return hilo
+
 class _PlainAvg(object):
     ''' Maintains records to allow calculation of the average value.
         Measurements can be passed in any unit of a compatible type, 
@@ -97,6 +116,16 @@ class _PlainAvg(object):
         _val = float(self.sum_value.value) / self.count
         return WxMeasurement(_val, self.sum_value.units)
 
+    def snapshot(self):
+        return [_snapshot_measurement(self.sum_value), self.count]
+
+    @classmethod
+    def from_snapshot(cls, data):
+        avg = cls()
+        avg.sum_value = _restore_measurement(data[0])
+        avg.count = data[1]
+        return avg
+
 class _RmsAvg(object):
     ''' Average a set of measurements using a Root Mean Square. '''
     def __init__(self):
@@ -139,26 +168,61 @@ class BasicAccumulator(object):
         self.first = 0
         self.last = 0
         self.nobs = 0
+        self._hilo_keys = frozenset(self.HILO)
+        self._avg_keys = frozenset(self.AVG)
         
     def add_observation(self, obs):
+        self.start_observation(obs.when)
+        for k,v in obs.measurements.items():
+            if k in self._hilo_keys:
+                self.record_hilo(k, v, obs.when)
+            if k in self._avg_keys:
+                self.record_avg(k, v, obs.when)
+        self.finish_observation(obs.when)
+
+    # The methods below are the steps of add_observation, split out so
+    # that an ObservationDispatcher can feed many accumulators from a
+    # single pass over each observation.
+    def start_observation(self, when):
         if self.first == 0:
-            self.first = obs.when
+            self.first = when
         # what should we do about observations that are from before last
         # timestamp?
-        for k,v in obs.measurements.items():
-            if k in self.HILO:
-                if not self.hilos.has_key(k):
-                    self.hilos[k] = _PlainHiLo()
-                self.hilos[k].check(v, obs.when)
-            if k in self.AVG:
-                if not self.avgs.has_key(k):
-                    self.avgs[k] = _PlainAvg()
-                self.avgs[k].add(v)
-                
-        if obs.when > self.last:
-            self.last = obs.when
+
+    def record_hilo(self, what, value, when):
+        hilo = self.hilos.get(what, None)
+        if hilo is None:
+            hilo = self.hilos[what] = _PlainHiLo()
+        hilo.check(value, when)
+
+    def record_avg(self, what, value, when):
+        avg = self.avgs.get(what, None)
+        if avg is None:
+            avg = self.avgs[what] = _PlainAvg()
+        avg.add(value)
+
+    def finish_observation(self, when):
+        if when > self.last:
+            self.last = when
         self.nobs += 1
 
+    def snapshot(self):
+        ''' Returns the accumulated state as a dict of plain values,
+            suitable for json. '''
+        return {'first': self.first, 'last': self.last, 'nobs': self.nobs,
+                'hilos': dict((k, v.snapshot()) for k,v in self.hilos.items()),
+                'avgs': dict((k, v.snapshot()) for k,v in self.avgs.items())}
+
+    def restore(self, data):
+        ''' Replace the accumulated state with that from a snapshot. '''
+        self.first = data['first']
+        self.last = data['last']
+        self.nobs = data['nobs']
+        self.hilos = dict((k, _PlainHiLo.from_snapshot(v))
+                                           for k,v in data['hilos'].items())
+        self.avgs = dict((k, _PlainAvg.from_snapshot(v))
+                                            for k,v in data['avgs'].items())
+
     @property
     def timespan(self):
         ''' Returns the timespan in seconds '''
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Alerts raised as observations arrive.
+    Two kinds of rule are supported.
+
+    ThresholdRule - the value crosses a threshold, e.g. gust above 40mph
+                    or temperature crossing 0C.
+    RateRule      - the value changes by a given amount within a period,
+                    e.g. pressure falling 3hPa in 3 hours.
+
+    Threshold rules for a measurement are kept sorted by threshold, so a
+    new reading only looks at the rules whose threshold lies between the
+    previous reading and this one. Rate rules keep a small ring buffer of
+    readings sampled across their period.
+
+    Each measurement is compared in the units of the first rule added for
+    it. Rules and readings in other units of the same category are
+    converted using the unit conversions.
+
+    An AlertEngine tracks a single station.
+'''
+
+import bisect
+import collections
+
+from wxconnector import WXUNITS
+from wxconnector.unit import WxUnit, WxConversionUnavailable
+
+RISING = 'rising'
+FALLING = 'falling'
+BOTH = 'both'
+
+def _convert(value, units, into):
+    if units == into:
+        return value
+    unit = units if isinstance(units, WxUnit) else WXUNITS.get(units)
+    if unit is None:
+        raise WxConversionUnavailable("Cannot convert from %s to %s" %
+                                                             (units, into))
+    return unit.convert(value, into)
+
+def _units_abbr(units):
+    return units.abbr if isinstance(units, WxUnit) else units
+
+class WxAlert(object):
+    ''' A rule that was triggered, with the measurement that did it. '''
+    def __init__(self, rule, when, value):
+        self.rule = rule
+        self.when = when
+        self.value = value
+
+    def __repr__(self):
+        return "%s @ %s: %s" % (self.rule.name, self.when, self.value)
+
+class ThresholdRule(object):
+    ''' Triggered when the value goes above the threshold (RISING), drops
+        to or below it (FALLING) or either (BOTH). The first reading for
+        a measurement triggers RISING and FALLING rules it is already
+        past.
+    '''
+    def __init__(self, name, what, threshold, units, direction = RISING):
+        self.name = name
+        self.what = what
+        self.threshold = threshold
+        self.units = units
+        self.direction = direction
+
+class RateRule(object):
+    ''' Triggered when the value has changed by at least change (which is
+        negative for a fall) over period seconds. The rule is re-armed
+        once the change is no longer that large.
+    '''
+    def __init__(self, name, what, change, period, units, slots = 12):
+        self.name = name
+        self.what = what
+        self.change = change
+        self.period = period
+        self.units = units
+        self.slots = slots
+
+class _Thresholds(object):
+    ''' The threshold rules for one measurement, sorted by threshold. '''
+    def __init__(self, units):
+        self.units = units
+        self.values = []
+        self.rules = []
+        self.last = None
+
+    def add(self, rule):
+        value = _convert(rule.threshold, rule.units, self.units)
+        pos = bisect.bisect_right(self.values, value)
+        self.values.insert(pos, value)
+        self.rules.insert(pos, rule)
+
+    def check(self, value):
+        last, self.last = self.last, value
+        if last is None:
+            pos = bisect.bisect_left(self.values, value)
+            return [r for r in self.rules[:pos] if r.direction == RISING] + \
+                   [r for r in self.rules[pos:] if r.direction == FALLING]
+        if value == last:
+            return []
+        lo = bisect.bisect_left(self.values, min(last, value))
+        hi = bisect.bisect_left(self.values, max(last, value))
+        skip = FALLING if value > last else RISING
+        return [r for r in self.rules[lo:hi] if r.direction != skip]
+
+class _Rate(object):
+    ''' Ring buffer of readings for a single rate rule. '''
+    def __init__(self, rule, units):
+        self.rule = rule
+        base = _convert(0, rule.units, units)
+        self.change = _convert(rule.change, rule.units, units) - base
+        self.step = float(rule.period) / rule.slots
+        self.samples = collections.deque(maxlen = rule.slots + 2)
+        self.active = False
+
+    def check(self, value, when):
+        samples = self.samples
+        if not samples or when - samples[-1][0] >= self.step:
+            samples.append((when, value))
+        # Compare against the newest sample that is at least a period old.
+        while len(samples) > 1 and when - samples[1][0] >= self.rule.period:
+            samples.popleft()
+        then, old = samples[0]
+        if when - then < self.rule.period:
+            return False
+        diff = value - old
+        met = diff <= self.change if self.change < 0 else diff >= self.change
+        fire = met and not self.active
+        self.active = met
+        return fire
+
+class AlertEngine(object):
+    ''' Add rules, then pass each observation to add_observation which
+        returns a list of the WxAlerts it triggered. Measurements that
+        cannot be converted to the units their rules use are skipped and
+        counted in rejected, by measurement name. '''
+    def __init__(self):
+        self.rejected = {}
+        self._units = {}
+        self._thresholds = {}
+        self._rates = {}
+
+    def _units_for(self, rule):
+        return self._units.setdefault(rule.what, _units_abbr(rule.units))
+
+    def add_rule(self, rule):
+        units = self._units_for(rule)
+        if isinstance(rule, RateRule):
+            self._rates.setdefault(rule.what, []).append(_Rate(rule, units))
+        else:
+            if not self._thresholds.has_key(rule.what):
+                self._thresholds[rule.what] = _Thresholds(units)
+            self._thresholds[rule.what].add(rule)
+
+    def add_observation(self, obs):
+        alerts = []
+        for k,v in obs.measurements.items():
+            units = self._units.get(k)
+            if units is None:
+                continue
+            try:
+                value = _convert(float(v.value), v.units, units)
+            except (WxConversionUnavailable, ValueError, TypeError):
+                self.rejected[k] = self.rejected.get(k, 0) + 1
+                continue
+            thresholds = self._thresholds.get(k)
+            if thresholds:
+                for rule in thresholds.check(value):
+                    alerts.append(WxAlert(rule, obs.when, v))
+            for rate in self._rates.get(k, ()):
+                if rate.check(value, obs.when):
+                    alerts.append(WxAlert(rate.rule, obs.when, v))
+        return alerts
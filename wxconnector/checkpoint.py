@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Periodic checkpoints of an accumulator.
+    Rebuilding today's statistics after a restart means replaying every
+    observation since the start of the day. A Checkpointer wraps an
+    accumulator, writes its state to disk every interval seconds of
+    observation time and, on startup, restores the state so that only
+    observations newer than the checkpoint need to be replayed.
+'''
+
+import json
+import os
+
+from wxconnector.utils.atomic import write_atomic
+
+class Checkpointer(object):
+    ''' Feed observations through add_observation rather than directly
+        to the accumulator. '''
+    def __init__(self, accumulator, filename, interval = 300):
+        self.accumulator = accumulator
+        self.filename = filename
+        self.interval = interval
+        self.saved_at = 0
+
+    def save(self):
+        data = {'accumulator': self.accumulator.snapshot()}
+        write_atomic(self.filename, json.dumps(data, separators=(',', ':')))
+        self.saved_at = self.accumulator.last
+
+    def restore(self):
+        ''' Restore the accumulator from the checkpoint file, if there is
+            one. Returns True if the state was restored. '''
+        if not os.path.exists(self.filename):
+            return False
+        data = json.load(open(self.filename))
+        self.accumulator.restore(data['accumulator'])
+        self.saved_at = self.accumulator.last
+        return True
+
+    def add_observation(self, obs):
+        self.accumulator.add_observation(obs)
+        if obs.when - self.saved_at >= self.interval:
+            self.save()
+
+    def replay(self, observations):
+        ''' Add the observations that are newer than the restored state.
+            Returns the number added. '''
+        count = 0
+        for obs in observations:
+            if obs.when <= self.accumulator.last:
+                continue
+            self.add_observation(obs)
+            count += 1
+        return count
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Change-only encoding of a stream of observations.
+    Consecutive observations from a station are mostly identical, so
+    rather than sending every measurement each time the encoder sends
+    a full keyframe periodically and, in between, deltas that only
+    carry the measurements that have changed since the previous
+    observation. The decoder keeps the current state and rebuilds full
+    WxObservation objects from the frames.
+
+    Frames are plain lists, in the same style as WxObservation.as_list(),
+    so they can be serialised with json or similar.
+
+        ['K', when, [[what, value, units], ...]]
+        ['D', offset, [index, value, index, value, ...]]
+        ['D', offset, [index, value, ...], [[index, value, units], ...]]
+        ['D', offset, [index, value, ...], [...], [removed index, ...]]
+
+    The keyframe fixes an index for each measurement, in the order they
+    are listed. A delta gives its time as an offset from the previous
+    frame. Measurements whose value changed are given as index, value
+    pairs. Those whose units changed are listed with their units, and
+    new measurements are listed by name, taking the next free index.
+'''
+
+from wxconnector.measurement import WxObservation
+
+KEYFRAME = 'K'
+DELTA = 'D'
+
+class DeltaStreamError(Exception):
+    pass
+
+class DeltaEncoder(object):
+    ''' Turn observations into keyframes and deltas. A keyframe is sent
+        for the first observation and then every keyframe_interval
+        observations, so a receiver that joins part way through a
+        stream is never more than that many frames from a full state.
+    '''
+    def __init__(self, keyframe_interval = 30):
+        self.keyframe_interval = keyframe_interval
+        self._state = {}
+        self._index = {}
+        self._when = None
+        self._since_key = None
+
+    def reset(self):
+        ''' Force the next frame to be a keyframe. '''
+        self._since_key = None
+
+    def _keyframe_due(self, when):
+        if self._since_key is None or \
+                               self._since_key >= self.keyframe_interval - 1:
+            return True
+        # The decoder adds the offset to its previous time, so only use
+        # one if that gives back exactly the same time.
+        return self._when + (when - self._when) != when
+
+    def encode(self, obs):
+        current = {}
+        for k,v in obs.measurements.items():
+            current[k] = v.as_list()
+
+        if self._keyframe_due(obs.when):
+            names = sorted(current)
+            self._index = dict((k, n) for n, k in enumerate(names))
+            frame = [KEYFRAME, obs.when, [[k] + current[k] for k in names]]
+            self._since_key = 0
+        else:
+            values = []
+            full = []
+            for k in sorted(current):
+                value, units = current[k]
+                old = self._state.get(k)
+                if old == current[k]:
+                    continue
+                n = self._index.get(k)
+                if n is None:
+                    self._index[k] = len(self._index)
+                    full.append([k, value, units])
+                elif old is None or old[1] != units:
+                    full.append([n, value, units])
+                else:
+                    values.extend((n, value))
+            frame = [DELTA, obs.when - self._when, values]
+            removed = sorted(self._index[k] for k in self._state
+                                                         if k not in current)
+            if full or removed:
+                frame.append(full)
+            if removed:
+                frame.append(removed)
+            self._since_key += 1
+        self._state = current
+        self._when = obs.when
+        return frame
+
+class DeltaDecoder(object):
+    ''' Rebuild full observations from a stream of frames produced by
+        a DeltaEncoder. Deltas received before the first keyframe
+        raise DeltaStreamError.
+    '''
+    def __init__(self):
+        self._state = None
+        self._names = []
+        self._when = None
+
+    @property
+    def synchronised(self):
+        return self._state is not None
+
+    def decode(self, frame):
+        kind = frame[0]
+        if kind == KEYFRAME:
+            self._state = {}
+            self._names = [m[0] for m in frame[2]]
+            self._when = frame[1]
+            for m in frame[2]:
+                self._state[m[0]] = (m[1], m[2])
+        elif kind == DELTA:
+            if self._state is None:
+                raise DeltaStreamError("Delta received before a keyframe")
+            self._when += frame[1]
+            if len(frame) > 4:
+                for n in frame[4]:
+                    self._state.pop(self._names[n], None)
+            values = frame[2]
+            for i in range(0, len(values), 2):
+                what = self._names[values[i]]
+                self._state[what] = (values[i + 1], self._state[what][1])
+            for m in (frame[3] if len(frame) > 3 else ()):
+                if isinstance(m[0], basestring):
+                    self._names.append(m[0])
+                    what = m[0]
+                else:
+                    what = self._names[m[0]]
+                self._state[what] = (m[1], m[2])
+        else:
+            raise DeltaStreamError("Unknown frame type '%s'" % kind)
+
+        obs = WxObservation(self._when)
+        for k,v in self._state.items():
+            obs.add_measurement(k, v[0], v[1])
+        return obs
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Davis Vantage consoles.
+    The console keeps an archive of records in a circular buffer of
+    pages which can be downloaded with the DMPAFT command. Each page is
+    267 bytes - a sequence number, 5 records of 52 bytes, 4 unused bytes
+    and a CRC - and the host must ACK each one before the next is sent.
+
+    The ArchiveDownloader fetches pages on the calling thread and hands
+    validated pages to a worker thread through a bounded queue, so
+    decoding and storing one page overlaps with fetching the next. After
+    each page is stored the timestamp of its newest record is written to
+    a resume file, so an interrupted download carries on from there.
+
+    The port can be anything with pyserial style read(n) and write(data)
+    methods. Waking the console is left to the caller.
+'''
+
+import os
+import struct
+import sys
+import threading
+import time
+import Queue
+
+from wxconnector.measurement import WxObservation
+from wxconnector.utils.atomic import write_atomic
+from wxconnector.utils.crc16 import crc_ccitt_16
+
+ACK = '\x06'
+NAK = '\x21'
+ESC = '\x1b'
+
+PAGE_SIZE = 267
+RECORD_SIZE = 52
+RECORDS_PER_PAGE = 5
+
+# The fields we decode from the start of a Rev B archive record.
+_RECORD = struct.Struct('<HHhhhHHHHHhBBBBBBBB')
+
+class VantageError(Exception):
+    pass
+
+def make_stamp(date, tm):
+    ''' Pack a (date, time) pair into the 4 bytes + CRC the console
+        expects for DMPAFT. '''
+    data = struct.pack('<HH', date, tm)
+    return data + struct.pack('>H', crc_ccitt_16(data))
+
+def record_stamp(data):
+    ''' Return the (date, time) stamp of an archive record, or None if
+        the record has never been written. Stamps compare in time order.
+    '''
+    date, tm = struct.unpack('<HH', data[:4])
+    if date in (0, 0xffff):
+        return None
+    return (date, tm)
+
+def stamp_to_time(stamp):
+    date, tm = stamp
+    return time.mktime((2000 + (date >> 9), (date >> 5) & 0x0f, date & 0x1f,
+                        tm // 100, tm % 100, 0, 0, 0, -1))
+
+def decode_archive_record(data):
+    ''' Decode a 52 byte archive record into a WxObservation. Fields
+        the console reports as dashed (no sensor) are not included. '''
+    (date, tm, out_temp, hi_temp, lo_temp, rain, hi_rain_rate, barometer,
+     solar, wind_samples, in_temp, in_humidity, out_humidity, wind_speed,
+     hi_wind_speed, hi_wind_dir, wind_dir, uv, et) = \
+                                      _RECORD.unpack(data[:_RECORD.size])
+    obs = WxObservation(stamp_to_time((date, tm)))
+    if out_temp != 32767:
+        obs.add_measurement('temperature', out_temp / 10.0, 'F')
+    if in_temp != 32767:
+        obs.add_measurement('inside_temperature', in_temp / 10.0, 'F')
+    if barometer:
+        obs.add_measurement('barometer', barometer / 1000.0, 'inHg')
+    if out_humidity != 255:
+        obs.add_measurement('humidity', out_humidity, '%')
+    if wind_speed != 255:
+        obs.add_measurement('wind_speed', wind_speed, 'mph')
+    if wind_dir != 255:
+        obs.add_measurement('wind_direction', wind_dir * 22.5, 'deg')
+    if uv != 255:
+        obs.add_measurement('uv', uv / 10.0, 'index')
+    if solar != 32767:
+        obs.add_measurement('solar_radiation', solar, 'W/m2')
+    obs.add_measurement('rain', rain * 0.01, 'in')
+    return obs
+
+class ArchiveDownloader(object):
+    ''' Download archive records newer than the resume point and pass
+        them, a page at a time, to ingest(observations). ingest is called
+        on the worker thread.
+    '''
+    def __init__(self, port, ingest, resume_file = None, queue_size = 4,
+                                                             retries = 3):
+        self.port = port
+        self.ingest = ingest
+        self.resume_file = resume_file
+        self.queue_size = queue_size
+        self.retries = retries
+        self.last_stamp = None
+        self.nrecords = 0
+        self._error = None
+
+    @property
+    def resume_point(self):
+        ''' The (date, time) stamp of the newest record stored, or
+            (0, 0) to download the whole archive. '''
+        if self.resume_file and os.path.exists(self.resume_file):
+            date, tm = open(self.resume_file).read().split()
+            return (int(date), int(tm))
+        return (0, 0)
+
+    def download(self, since = None):
+        ''' Download and ingest every record newer than since (defaults
+            to the resume point). Returns the number of records ingested.
+        '''
+        self.last_stamp = since or self.resume_point
+        self.nrecords = 0
+        self._error = None
+        npages, first = self._start(self.last_stamp)
+
+        pages = Queue.Queue(self.queue_size)
+        worker = threading.Thread(target = self._worker, args = (pages,))
+        worker.daemon = True
+        worker.start()
+        try:
+            for n in range(npages):
+                page = self._read_page()
+                if self._error:
+                    self.port.write(ESC)
+                    break
+                self.port.write(ACK)
+                pages.put((page, first if n == 0 else 0))
+        finally:
+            pages.put(None)
+            worker.join()
+
+        if self._error:
+            raise self._error[0], self._error[1], self._error[2]
+        return self.nrecords
+
+    def _expect_ack(self, what):
+        reply = self.port.read(1)
+        if reply != ACK:
+            raise VantageError("No ACK from console for %s" % what)
+
+    def _start(self, since):
+        self.port.write('DMPAFT\n')
+        self._expect_ack('DMPAFT')
+        self.port.write(make_stamp(*since))
+        self._expect_ack('timestamp')
+        header = self.port.read(6)
+        if len(header) != 6 or crc_ccitt_16(header) != 0:
+            self.port.write(ESC)
+            raise VantageError("Invalid DMPAFT page count from console")
+        npages, first = struct.unpack('<HH', header[:4])
+        self.port.write(ACK)
+        return npages, first
+
+    def _read_page(self):
+        for attempt in range(self.retries + 1):
+            page = self.port.read(PAGE_SIZE)
+            if len(page) == PAGE_SIZE and crc_ccitt_16(page) == 0:
+                return page
+            if attempt < self.retries:
+                self.port.write(NAK)
+        self.port.write(ESC)
+        raise VantageError("Archive page failed CRC %d times" %
+                                                       (self.retries + 1))
+
+    def _worker(self, pages):
+        while True:
+            item = pages.get()
+            if item is None:
+                return
+            if self._error:
+                continue
+            try:
+                self._store_page(*item)
+            except Exception:
+                self._error = sys.exc_info()
+
+    def _store_page(self, page, first):
+        observations = []
+        stamp = self.last_stamp
+        for n in range(first, RECORDS_PER_PAGE):
+            record = page[1 + n * RECORD_SIZE:1 + (n + 1) * RECORD_SIZE]
+            rstamp = record_stamp(record)
+            # The last page can hold records older than the ones we asked
+            # for as the archive wraps around.
+            if rstamp is None or rstamp <= stamp:
+                continue
+            observations.append(decode_archive_record(record))
+            stamp = rstamp
+        if not observations:
+            return
+        self.ingest(observations)
+        self.last_stamp = stamp
+        self.nrecords += len(observations)
+        if self.resume_file:
+            write_atomic(self.resume_file, '%d %d\n' % stamp)
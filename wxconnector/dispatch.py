@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Feed one stream of observations to many accumulators.
+    Each accumulator walks every measurement of every observation it is
+    given, so running a daily, a seasonal and a handful of alert
+    accumulators side by side repeats the same work for each of them.
+    The dispatcher builds a routing table from measurement name to the
+    accumulators that record statistics for it and walks each
+    observation once, handing each measurement only to those.
+'''
+
+class ObservationDispatcher(object):
+    ''' Register accumulators and pass observations to add_observation. '''
+    def __init__(self, accumulators = ()):
+        self.accumulators = []
+        self._routes = {}
+        for acc in accumulators:
+            self.register(acc)
+
+    def register(self, acc):
+        self.accumulators.append(acc)
+        self._build_routes()
+
+    def unregister(self, acc):
+        self.accumulators.remove(acc)
+        self._build_routes()
+
+    def _build_routes(self):
+        routes = {}
+        for acc in self.accumulators:
+            for k in set(acc.HILO):
+                routes.setdefault(k, []).append(acc.record_hilo)
+            for k in set(acc.AVG):
+                routes.setdefault(k, []).append(acc.record_avg)
+        self._routes = dict((k, tuple(v)) for k,v in routes.items())
+
+    def routes_for(self, what):
+        ''' Returns the statistic recorders a measurement is sent to. '''
+        return self._routes.get(what, ())
+
+    def add_observation(self, obs):
+        when = obs.when
+        for acc in self.accumulators:
+            acc.start_observation(when)
+        routes = self._routes
+        for k,v in obs.measurements.items():
+            for record in routes.get(k, ()):
+                record(k, v, when)
+        for acc in self.accumulators:
+            acc.finish_observation(when)
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Reduce long series of readings to a number of points for charting.
+    Two modes are available.
+
+    LTTB   - Largest-Triangle-Three-Buckets. One point per bucket, chosen
+             to keep the visual shape of the series.
+    MINMAX - The lowest and highest reading in each bucket.
+
+    Whichever mode is used, the highest and lowest readings of the whole
+    series - the ones a _PlainHiLo would report, including the time of the
+    first occurrence - are always kept. With LTTB this can add a point if
+    both fall in the same bucket.
+
+    lttb() and minmax() work on sequences of times and values and return
+    the indices to keep. If numpy is available and numpy arrays are passed
+    the work within each bucket is vectorised. downsample() works on an
+    iterator of WxObservations, holding no more than two buckets of
+    readings at a time.
+'''
+
+import bisect
+
+from wxconnector.accumulator import _convert_if_required
+from wxconnector.measurement import WxMeasurement
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LTTB = 'lttb'
+MINMAX = 'minmax'
+
+def _extremes(values):
+    ''' Index of the first lowest and first highest value. '''
+    lo = hi = 0
+    for i, v in enumerate(values):
+        if v < values[lo]:
+            lo = i
+        if v > values[hi]:
+            hi = i
+    return lo, hi
+
+def _keep_extremes(selected, extremes, pinned = ()):
+    ''' selected is a list of (bucket, item) and extremes a list of
+        (bucket, item) that must appear. Each extreme replaces the item
+        chosen for its bucket, unless that is the other extreme or the
+        bucket is one of the pinned endpoint buckets, in which case it is
+        added. Returns the items in order. '''
+    chosen = {}
+    for b, item in selected:
+        chosen.setdefault(b, []).append(item)
+    must = [e[1] for e in extremes]
+    for b, item in extremes:
+        items = chosen.setdefault(b, [])
+        if item in items:
+            continue
+        if b in pinned or [i for i in items if i in must]:
+            items.append(item)
+            items.sort()
+        else:
+            items[:] = [item]
+    result = []
+    for b in sorted(chosen):
+        result.extend(chosen[b])
+    return result
+
+def _triangle_pick(xs, ys, ax, ay, cx, cy):
+    best = 0
+    best_area = -1
+    for i in range(len(xs)):
+        area = abs((ax - cx) * (ys[i] - ay) - (ax - xs[i]) * (cy - ay))
+        if area > best_area:
+            best_area = area
+            best = i
+    return best
+
+def _numpy_pick(xs, ys, ax, ay, cx, cy):
+    return int(numpy.argmax(numpy.abs((ax - cx) * (ys - ay) -
+                                      (ax - xs) * (cy - ay))))
+
+def _mean(values):
+    return float(sum(values)) / len(values)
+
+def lttb(x, y, n):
+    ''' Returns the indices of the points to keep. '''
+    size = len(x)
+    if n < 3:
+        raise ValueError("LTTB needs at least 3 points")
+    if n >= size:
+        return list(range(size))
+    vectorised = numpy is not None and isinstance(y, numpy.ndarray)
+    if vectorised:
+        x = numpy.asarray(x, dtype = float)
+        pick, mean = _numpy_pick, numpy.mean
+    else:
+        pick, mean = _triangle_pick, _mean
+
+    # The first and last points are buckets of their own, the rest are
+    # split into n - 2 buckets.
+    bounds = [1 + i * (size - 2) // (n - 2) for i in range(n - 1)] + [size]
+    selected = [(0, 0)]
+    a = 0
+    for b in range(1, n - 1):
+        start, stop = bounds[b - 1], bounds[b]
+        nstop = bounds[b + 1]
+        cx = mean(x[stop:nstop])
+        cy = mean(y[stop:nstop])
+        a = start + pick(x[start:stop], y[start:stop], x[a], y[a], cx, cy)
+        selected.append((b, a))
+    selected.append((n - 1, size - 1))
+
+    if vectorised:
+        lo, hi = int(numpy.argmin(y)), int(numpy.argmax(y))
+    else:
+        lo, hi = _extremes(y)
+    bucket = lambda i: bisect.bisect_right(bounds, i) if i else 0
+    return _keep_extremes(selected, [(bucket(lo), lo), (bucket(hi), hi)],
+                          (0, n - 1))
+
+def minmax(x, y, n):
+    ''' Returns the indices of the lowest and highest value in each of
+        n // 2 buckets. '''
+    size = len(x)
+    if n < 2:
+        raise ValueError("min/max needs at least 2 points")
+    if n >= size:
+        return list(range(size))
+    vectorised = numpy is not None and isinstance(y, numpy.ndarray)
+    nbuckets = n // 2
+    indices = []
+    for b in range(nbuckets):
+        start, stop = b * size // nbuckets, (b + 1) * size // nbuckets
+        if vectorised:
+            lo = int(numpy.argmin(y[start:stop]))
+            hi = int(numpy.argmax(y[start:stop]))
+        else:
+            lo, hi = _extremes(y[start:stop])
+        indices.extend(sorted(set((start + lo, start + hi))))
+    return indices
+
+class _Stream(object):
+    ''' Time bucketed downsampling of (when, value) points. '''
+    def __init__(self, mode, n, start, end):
+        self.mode = mode
+        nbuckets = n - 2 if mode == LTTB else n // 2
+        self.nbuckets = nbuckets
+        self.start = start
+        self.width = float(end - start) / nbuckets or 1.0
+        self.selected = []
+        self.lo = self.hi = None
+
+    def bucket(self, when):
+        return min(max(int((when - self.start) / self.width), 0),
+                   self.nbuckets - 1)
+
+    def _extreme(self, point, b):
+        if self.lo is None or point[1] < self.lo[1][1]:
+            self.lo = (b, point)
+        if self.hi is None or point[1] > self.hi[1][1]:
+            self.hi = (b, point)
+
+    def _pick(self, points, next_points):
+        a = self.selected[-1][1]
+        cx = _mean([p[0] for p in next_points])
+        cy = _mean([p[1] for p in next_points])
+        best = _triangle_pick([p[0] for p in points], [p[1] for p in points],
+                              a[0], a[1], cx, cy)
+        return points[best]
+
+    def run(self, points):
+        if self.mode == LTTB:
+            self._lttb(points)
+        else:
+            self._minmax(points)
+        if self.lo is None:
+            return []
+        pinned = (-1, self.nbuckets) if self.mode == LTTB else ()
+        return _keep_extremes(self.selected, [self.lo, self.hi], pinned)
+
+    def _lttb(self, points):
+        pending = current = last = None
+        for p in points:
+            if not self.selected:
+                self.selected.append((-1, p))
+                self._extreme(p, -1)
+                continue
+            b = self.bucket(p[0])
+            self._extreme(p, b)
+            last = p
+            if current is None:
+                current = (b, [p])
+            elif current[0] == b:
+                current[1].append(p)
+            else:
+                if pending:
+                    self.selected.append((pending[0],
+                                          self._pick(pending[1], current[1])))
+                pending, current = current, (b, [p])
+        if last is None:
+            return
+        # The last point is a bucket of its own.
+        current[1].pop()
+        if not current[1]:
+            current = None
+        if pending:
+            self.selected.append((pending[0], self._pick(pending[1],
+                                          current[1] if current else [last])))
+        if current:
+            self.selected.append((current[0],
+                                  self._pick(current[1], [last])))
+        self.selected.append((self.nbuckets, last))
+        for ext in ('lo', 'hi'):
+            if getattr(self, ext)[1] is last:
+                setattr(self, ext, (self.nbuckets, last))
+
+    def _minmax(self, points):
+        current = None
+        for p in points:
+            b = self.bucket(p[0])
+            self._extreme(p, b)
+            if current is None or current[0] != b:
+                if current:
+                    self._emit(current)
+                current = [b, p, p]
+            else:
+                if p[1] < current[1][1]:
+                    current[1] = p
+                if p[1] > current[2][1]:
+                    current[2] = p
+        if current:
+            self._emit(current)
+
+    def _emit(self, bucket):
+        b, lo, hi = bucket
+        self.selected.append((b, min(lo, hi)))
+        if lo is not hi:
+            self.selected.append((b, max(lo, hi)))
+
+def downsample(observations, what, n, mode = LTTB, start = None, end = None):
+    ''' Downsample the what measurement of a series of observations to
+        about n points. Values are converted to the units of the first
+        measurement, as _PlainHiLo does. Observations are consumed as an
+        iterator if start and end times are given, otherwise they are
+        read into a list first to find them.
+        Returns a list of (when, WxMeasurement).
+    '''
+    if n < (3 if mode == LTTB else 2):
+        raise ValueError("Too few points requested for %s" % mode)
+    state = {}
+    def points(observations):
+        for obs in observations:
+            m = obs[what]
+            if m is None:
+                continue
+            first = state.setdefault('first', m)
+            yield (obs.when, _convert_if_required(first, m))
+
+    if start is None or end is None:
+        observations = [o for o in observations if o[what] is not None]
+        if not observations:
+            return []
+        start = observations[0].when if start is None else start
+        end = observations[-1].when if end is None else end
+    selected = _Stream(mode, n, start, end).run(points(observations))
+    if not selected:
+        return []
+    units = state['first'].units
+    return [(p[0], WxMeasurement(p[1], units)) for p in selected]
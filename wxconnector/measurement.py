@@ -51,6 +51,14 @@ class WxObservation(object):
         self.when = timestamp or time.time()
         self.measurements = {}
 
+    @classmethod
+    def from_list(cls, data):
+        ''' Create an observation from the output of as_list(). '''
+        obs = cls(data[0])
+        for m in data[1]:
+            obs.add_measurement(*m)
+        return obs
+
     def __getitem__(self, what):
         return self.measurements.get(what, None)
         
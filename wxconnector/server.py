@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' A small HTTP server for current conditions and summaries.
+
+    /current   the latest observation
+    /summary   highs, lows and averages from each accumulator
+
+    Both take ?units=metric or ?units=imperial and return json. Converting
+    and formatting every measurement is relatively slow, so each response
+    is rendered once per unit system and kept until the next observation
+    arrives. Responses carry an ETag and a request with a matching
+    If-None-Match gets a 304.
+'''
+
+import BaseHTTPServer
+import SocketServer
+import json
+import threading
+import time
+import urlparse
+
+from wxconnector import WXUNITS
+from wxconnector.unit import WxUnit
+
+# Which unit to show for each unit category.
+UNIT_SYSTEMS = {
+    'metric': {'temperature': 'C', 'pressure': 'hPa', 'speed': 'kph',
+               'distance': 'mm'},
+    'imperial': {'temperature': 'F', 'pressure': 'inHg', 'speed': 'mph',
+                 'distance': 'in'},
+}
+
+def _render_measurement(m, system):
+    units = m.units
+    if isinstance(units, WxUnit):
+        into = UNIT_SYSTEMS[system].get(units.category, units.abbr)
+        value = m.convert_to(into if into != units.abbr else '')
+        return {'value': value, 'units': into,
+                'text': WXUNITS[into].format_value(value)}
+    return {'value': m.value, 'units': units, 'text': repr(m)}
+
+def _render_current(cache, system):
+    obs = cache.latest
+    if obs is None:
+        return None
+    return {'when': obs.when,
+            'measurements': dict((k, _render_measurement(v, system))
+                                         for k,v in obs.measurements.items())}
+
+def _render_hilo(hilo, system):
+    value, when = hilo
+    data = _render_measurement(value, system)
+    data['when'] = when
+    return data
+
+def _render_summary(cache, system):
+    summary = {}
+    for name, acc in cache.accumulators.items():
+        summary[name] = {
+            'first': acc.first, 'last': acc.last, 'nobs': acc.nobs,
+            'highs': dict((k, _render_hilo(acc.get_highest(k), system))
+                                                      for k in acc.hilos),
+            'lows': dict((k, _render_hilo(acc.get_lowest(k), system))
+                                                      for k in acc.hilos),
+            'averages': dict((k, _render_measurement(v.avg(), system))
+                                               for k,v in acc.avgs.items()),
+        }
+    return summary
+
+RESOURCES = {
+    '/current': _render_current,
+    '/summary': _render_summary,
+}
+
+class ResponseCache(object):
+    ''' Holds the latest observation, feeds it to the accumulators and
+        keeps the rendered responses until the next one arrives. '''
+    def __init__(self, accumulators = None):
+        self.accumulators = accumulators or {}
+        self.latest = None
+        self.generation = 0
+        # Keeps ETags from a previous run from matching after a restart.
+        self._started = int(time.time())
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def add_observation(self, obs):
+        with self._lock:
+            for acc in self.accumulators.values():
+                acc.add_observation(obs)
+            self.latest = obs
+            self.generation += 1
+            self._responses = {}
+
+    def get(self, path, system):
+        ''' Returns (etag, body) or None if there is nothing to show. '''
+        key = (path, system)
+        response = self._responses.get(key)
+        if response is not None:
+            return response
+        with self._lock:
+            response = self._responses.get(key)
+            if response is None:
+                data = RESOURCES[path](self, system)
+                if data is None:
+                    return None
+                etag = '"%x-%d-%s-%s"' % (self._started, self.generation,
+                                                  path.strip('/'), system)
+                response = (etag, json.dumps(data, separators=(',', ':')))
+                self._responses[key] = response
+            return response
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one write, rather than a packet per header,
+    # so keep-alive connections don't stall on delayed ACKs.
+    wbufsize = -1
+
+    def _reply(self, code, body = '', etag = None):
+        self.send_response(code)
+        if etag:
+            self.send_header('ETag', etag)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        system = urlparse.parse_qs(url.query).get('units', ['metric'])[0]
+        if url.path not in RESOURCES or system not in UNIT_SYSTEMS:
+            return self._reply(404)
+        response = self.server.cache.get(url.path, system)
+        if response is None:
+            return self._reply(404)
+        etag, body = response
+        if self.headers.get('If-None-Match') == etag:
+            return self._reply(304, etag = etag)
+        self._reply(200, body, etag)
+
+    def log_message(self, format, *args):
+        pass
+
+class WxQueryServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    ''' Serve the responses held by a ResponseCache. Use serve_forever()
+        as with any SocketServer. '''
+    daemon_threads = True
+
+    def __init__(self, address, cache):
+        BaseHTTPServer.HTTPServer.__init__(self, address, _Handler)
+        self.cache = cache
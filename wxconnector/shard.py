@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+''' Accumulate observations for many stations across worker processes.
+    Stations are assigned to workers by consistent hashing, so each
+    station's accumulator lives in exactly one worker. Observations are
+    batched per worker and sent down a pipe, and get_highest/get_lowest
+    queries are routed to the worker that owns the station.
+
+    If a worker dies it is restarted the next time it is needed. Stations
+    on other workers are not affected. When a checkpoint_dir is given each
+    station's accumulator is checkpointed there, and the worker reports
+    each checkpoint back. Until then the registry keeps the readings it
+    has sent, and a restarted worker restores its stations' checkpoints
+    and is sent those readings again. Without a checkpoint_dir nothing is
+    kept, so a restarted worker starts with empty accumulators and all
+    of its stations' readings are lost.
+'''
+
+import bisect
+import hashlib
+import multiprocessing
+import os
+import re
+
+from wxconnector.accumulator import BasicAccumulator
+from wxconnector.checkpoint import Checkpointer
+from wxconnector.measurement import WxMeasurement, WxObservation
+
+def _hash(key):
+    return int(hashlib.md5(str(key)).hexdigest()[:8], 16)
+
+def _checkpoint_name(station):
+    ''' A safe filename for a station's checkpoint. The hash keeps
+        stations whose names only differ in unsafe characters apart. '''
+    safe = re.sub(r'[^A-Za-z0-9_-]', '_', str(station))[:32]
+    return '%s-%s.ckpt' % (safe, hashlib.md5(str(station)).hexdigest()[:8])
+
+class _HashRing(object):
+    ''' Consistent hash ring with a number of points per node. '''
+    def __init__(self, nodes, replicas = 64):
+        points = []
+        for node in nodes:
+            for r in range(replicas):
+                points.append((_hash('%s-%d' % (node, r)), node))
+        points.sort()
+        self._hashes = [p[0] for p in points]
+        self._nodes = [p[1] for p in points]
+
+    def node_for(self, key):
+        pos = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[pos]
+
+class _Worker(object):
+    ''' The accumulators for the stations owned by one worker process. '''
+    def __init__(self, factory, checkpoint_dir, interval):
+        self.factory = factory
+        self.checkpoint_dir = checkpoint_dir
+        self.interval = interval
+        self.stations = {}
+        self.checkpoints = {}
+        self.catching_up = {}
+        self.received = {}
+
+    def _filename(self, station):
+        return os.path.join(self.checkpoint_dir, _checkpoint_name(station))
+
+    def station(self, station):
+        acc = self.stations.get(station)
+        if acc is None:
+            acc = self.stations[station] = self.factory()
+            if self.checkpoint_dir:
+                ck = Checkpointer(acc, self._filename(station), self.interval)
+                if ck.restore():
+                    # Observations up to here are already in the checkpoint
+                    # and may be sent again after a restart.
+                    self.catching_up[station] = acc.last
+                self.checkpoints[station] = ck
+        return acc
+
+    def add_observations(self, batch):
+        ''' Returns a dict of the stations checkpointed during the batch,
+            with the number of readings received for each station up to
+            its checkpoint. '''
+        saved = {}
+        for station, data in batch:
+            count = self.received[station] = self.received.get(station, 0) + 1
+            obs = WxObservation.from_list(data)
+            acc = self.station(station)
+            ck = self.checkpoints.get(station)
+            if ck is None:
+                acc.add_observation(obs)
+                continue
+            if station in self.catching_up:
+                if obs.when <= self.catching_up[station]:
+                    continue
+                del self.catching_up[station]
+            saved_at = ck.saved_at
+            ck.add_observation(obs)
+            if ck.saved_at != saved_at:
+                saved[station] = count
+        return saved
+
+    def query(self, method, station, what):
+        if station not in self.stations and self.checkpoint_dir and \
+                                 os.path.exists(self._filename(station)):
+            self.station(station)
+        acc = self.stations.get(station)
+        if acc is None:
+            return (None, 0)
+        value, when = getattr(acc, method)(what)
+        return (value.as_list() if value else None, when)
+
+    def close(self):
+        for ck in self.checkpoints.values():
+            ck.save()
+
+def _worker_main(conn, factory, checkpoint_dir, interval):
+    worker = _Worker(factory, checkpoint_dir, interval)
+    while True:
+        msg = conn.recv()
+        if msg[0] == 'obs':
+            saved = worker.add_observations(msg[1])
+            if saved and checkpoint_dir:
+                conn.send(('saved', saved))
+        elif msg[0] == 'query':
+            conn.send(('reply', worker.query(*msg[1:])))
+        elif msg[0] == 'stop':
+            worker.close()
+            conn.send(('reply', True))
+            return
+
+class StationRegistry(object):
+    ''' Pass observations for any station to add_observation and query
+        them with get_highest/get_lowest. factory is called in the worker
+        to create each station's accumulator.
+
+        With a checkpoint_dir, the readings for each station since its
+        last checkpoint - up to interval seconds of them - are held here
+        so a worker that dies loses nothing. Without one, a worker that
+        dies loses everything it had accumulated. '''
+    def __init__(self, workers = 4, factory = BasicAccumulator,
+                 batch_size = 100, checkpoint_dir = None, interval = 300):
+        self.factory = factory
+        self.batch_size = batch_size
+        self.checkpoint_dir = checkpoint_dir
+        self.interval = interval
+        self.restarts = 0
+        self._ring = _HashRing(range(workers))
+        self._procs = [None] * workers
+        self._conns = [None] * workers
+        self._pending = [[] for n in range(workers)]
+        # station -> [readings dropped so far, readings not yet checkpointed]
+        self._unsaved = [{} for n in range(workers)]
+        for n in range(workers):
+            self._start(n)
+
+    def _start(self, n):
+        parent, child = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target = _worker_main,
+                    args = (child, self.factory, self.checkpoint_dir,
+                            self.interval))
+        proc.daemon = True
+        proc.start()
+        child.close()
+        self._procs[n] = proc
+        self._conns[n] = parent
+
+    def _restart(self, n):
+        proc = self._procs[n]
+        if proc.is_alive():
+            proc.terminate()
+        proc.join()
+        self._conns[n].close()
+        self.restarts += 1
+        self._start(n)
+        # The new worker counts readings from zero, starting with these.
+        batch = []
+        for station, entry in self._unsaved[n].items():
+            entry[0] = 0
+            batch.extend((station, data) for data in entry[1])
+        if batch:
+            self._conns[n].send(('obs', batch))
+
+    def worker_for(self, station):
+        return self._ring.node_for(station)
+
+    def is_alive(self, n):
+        return self._procs[n].is_alive()
+
+    def _saved(self, n, counts):
+        for station, count in counts.items():
+            entry = self._unsaved[n].get(station)
+            if entry:
+                del entry[1][:count - entry[0]]
+                entry[0] = count
+
+    def _receive(self, n, reply = False):
+        ''' Handle the checkpoints worker n has reported. If reply is set,
+            wait for and return the reply to a message. '''
+        conn = self._conns[n]
+        while reply or conn.poll():
+            kind, data = conn.recv()
+            if kind == 'saved':
+                self._saved(n, data)
+            else:
+                return data
+
+    def _call(self, n, msg, reply = False):
+        for attempt in range(2):
+            if not self._procs[n].is_alive():
+                self._restart(n)
+            try:
+                self._receive(n)
+                self._conns[n].send(msg)
+                if reply:
+                    return self._receive(n, True)
+                return
+            except (IOError, OSError, EOFError):
+                if attempt:
+                    raise
+                self._restart(n)
+
+    def add_observation(self, station, obs):
+        n = self.worker_for(station)
+        self._pending[n].append((station, obs.as_list()))
+        if len(self._pending[n]) >= self.batch_size:
+            self._flush(n)
+
+    def _flush(self, n):
+        batch, self._pending[n] = self._pending[n], []
+        if batch:
+            self._call(n, ('obs', batch))
+            if self.checkpoint_dir:
+                unsaved = self._unsaved[n]
+                for station, data in batch:
+                    unsaved.setdefault(station, [0, []])[1].append(data)
+
+    def flush(self):
+        for n in range(len(self._procs)):
+            self._flush(n)
+
+    def _query(self, method, station, what):
+        n = self.worker_for(station)
+        self._flush(n)
+        value, when = self._call(n, ('query', method, station, what), True)
+        return (WxMeasurement(*value) if value else None, when)
+
+    def get_highest(self, station, what):
+        return self._query('get_highest', station, what)
+
+    def get_lowest(self, station, what):
+        return self._query('get_lowest', station, what)
+
+    def close(self):
+        self.flush()
+        for n in range(len(self._procs)):
+            self._call(n, ('stop',), True)
+            self._procs[n].join()
+            self._conns[n].close()
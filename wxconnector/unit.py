@@ -51,6 +51,17 @@ class WxUnit(object):
         except KeyError:
             return WxConversionUnavailable("Cannot convert from %s to %s" % (self.abbr, into))
 
+    def convert(self, value, into):
+        ''' Convert a value into different units without rounding.
+            Raises WxConversionUnavailable if there is no conversion. '''
+        if into == self.abbr:
+            return value
+        try:
+            return self._conversions[into](value)
+        except KeyError:
+            raise WxConversionUnavailable("Cannot convert from %s to %s" %
+                                                          (self.abbr, into))
+
     @property
     def decimal_places(self):
         try:
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2012 David Reid
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+
+def write_atomic(filename, data):
+    ''' Write data to filename so that readers only ever see the old or
+        the new contents, never a partially written file. '''
+    tmp = '%s.tmp' % filename
+    fh = open(tmp, 'wb')
+    try:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    finally:
+        fh.close()
+    os.rename(tmp, filename)